@@ -0,0 +1,48 @@
+""" Memory per result of the classic list of dicts vs ResultSet.
+
+Usage (from the root of the repository):
+    python -m benchmarks.result_memory [N]
+"""
+import sys
+import tracemalloc
+from gtool.results import ResultSet
+
+
+def _fake_urls(n):
+    # Few domains and many paths, like a batch of news searches
+    return [f"https://site{i % 5000}.com/news/{i}" for i in range(n)]
+
+
+def _measure(build, urls):
+    tracemalloc.start()
+    results = build(urls)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del results
+    return size / len(urls)
+
+
+def build_dicts(urls):
+    results = []
+    for i, url in enumerate(urls):
+        results.append({"url": url, "position": i+1, "page": i//10+1})
+    return results
+
+
+def build_result_set(urls):
+    results = ResultSet()
+    for i, url in enumerate(urls):
+        results.append(url, i+1, i//10+1)
+    return results
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    urls = _fake_urls(n) # Created before measuring, only the containers are counted
+    print(f"{n} results (URL strings not included)")
+    print(f"list[dict]: {_measure(build_dicts, urls):8.1f} B/result")
+    print(f"ResultSet:  {_measure(build_result_set, urls):8.1f} B/result")
+
+
+if __name__ == '__main__':
+    main()
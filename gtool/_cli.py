@@ -2,11 +2,14 @@ import os
 import json
 import random
 import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
 from gtool.modules.base import BaseEngine
-from gtool.settings import USER_AGENTS
+from gtool.archive import archive_paths, reextract_file
+from gtool.settings import USER_AGENTS, RETRY_MAX_ATTEMPTS, READ_TIMEOUT, SEARCH_DEADLINE
 from gtool.logs import setup_logging, valid_loglevel, configure_logging
 
 
@@ -47,11 +50,44 @@ def _configure_argparse():
         help="The maximum number of search result pages to crawl. Default is 3."
     )
 
+    group_g.add_argument(
+        '--retries',
+        dest='retries',
+        type=int,
+        default=RETRY_MAX_ATTEMPTS,
+        help=f"Attempts per page when a transient error (5xx, proxy error, timeout) happens. Default is {RETRY_MAX_ATTEMPTS}."
+    )
+
+    group_g.add_argument(
+        '--timeout',
+        dest='timeout',
+        type=float,
+        default=READ_TIMEOUT,
+        help=f"Read timeout (in seconds) of every request. Default is {READ_TIMEOUT}."
+    )
+
+    group_g.add_argument(
+        '--deadline',
+        dest='deadline',
+        type=float,
+        default=SEARCH_DEADLINE,
+        help=f"Total seconds allowed for the whole search (retries included). Default is {SEARCH_DEADLINE}."
+    )
+
+    group_g.add_argument(
+        '--archive',
+        dest='archive',
+        metavar='DIR',
+        type=str,
+        default=None,
+        help='If set, every raw response is stored in compressed append-only files inside DIR (see the "reextract" command).',
+    )
+
     group_g.add_argument(
         '-v', '--verbose',
         dest='verbose',
         action='store_true', 
-        help='If set, returns a JSON with more information (like the page and position of the URL).',
+        help='If set, returns a JSON with more information (like the page and position of the URL, and the query of every search for "reextract").',
     )
 
     # Required arguments
@@ -61,8 +97,7 @@ def _configure_argparse():
         dest='query',
         metavar='QUERY',
         type=str, 
-        required=True,
-        help='Query to search.',
+        help='Query to search (required by the engines).',
     )
 
     group_r.add_argument(
@@ -85,13 +120,57 @@ def _configure_argparse():
         cls._cli_setup_parser(subparser)
         # When action TweetSearch is choosen, the following line add to the args list
         # the args.cls with the value of the class related to that class
-        subparser.set_defaults(cls=cls) 
+        subparser.set_defaults(cls=cls, func=search)
+
+    # Offline action, it re-extracts the archived responses of any engine
+    subparser = subparsers.add_parser(
+        'reextract',
+        help='Extract again the results of archived responses (--archive) without network.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    subparser.add_argument(
+        'paths',
+        metavar='ARCHIVE',
+        nargs='+',
+        help='Archive files or folders with archive files.',
+    )
+    subparser.add_argument(
+        '-j', '--jobs',
+        dest='jobs',
+        type=int,
+        default=None,
+        help='Number of worker processes (one archive file per process). Default is the number of CPUs.',
+    )
+    subparser.set_defaults(func=reextract)
 
     # Once parser has been configured, arguments will be parsed
     args = parser.parse_args()
+    if args.func is search and not args.query:
+        parser.error(f"the following arguments are required for {args.engine}: -q/--query")
     return args
 
 
+def reextract(args):
+    """ Run the extraction of every engine over the archived responses in parallel."""
+    paths = archive_paths(args.paths)
+    engines = {cls.name: cls for cls in BaseEngine.__subclasses__()}
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        searches = [
+            search
+            for file_searches in executor.map(partial(reextract_file, engines=engines), paths)
+            for search in file_searches
+        ]
+
+    ext = '.json' if args.verbose else '.txt'
+    with open(args.filename + ext, "w") as file:
+        if args.verbose:
+            json.dump([dict(search, results=search["results"].to_list()) for search in searches], file)
+        else:
+            [search["results"].write_txt(file) for search in searches]
+
+    _logger.info(f"[{sum(len(search['results']) for search in searches)} URLs extracted from {len(searches)} searches]")
+
+
 def _load_proxy():
     """ In case of arg.proxy = True the proxy url will be read from the enviroment
     variable "PROXY_URL". 
@@ -110,15 +189,16 @@ def _load_proxy():
     }
 
 
-def main():
+def search(args):
+    """ Run the search of the choosen engine and store the URLs found."""
 
-    # Setup configuration
-    args = _configure_argparse()
-    configure_logging(args.loglevel)
-    proxies = _load_proxy() if args.proxies else {}
-   
-    # Initialize class from choosen egine
-    engine_obj = args.cls._cli_from_args(args)
+    # Initialize class from choosen egine (before the proxy, --rotate may load PROXY_URL)
+    try:
+        engine_obj = args.cls._cli_from_args(args)
+        proxies = _load_proxy() if args.proxies else {}
+    except Exception as e:
+        _logger.error(e)
+        return
 
     ext = '.json' if args.verbose else '.txt'
     with open(args.filename + ext, "w") as file:
@@ -135,11 +215,23 @@ def main():
             return 
 
         if args.verbose:
-            json.dump(results, file)
+            results.write_json(file)
         else:
-            [file.write(f'{d.get("url", None)}\n') for d in results]
+            results.write_txt(file)
 
+    if engine_obj.block_reason:
+        _logger.warning(f"[SEARCH BLOCKED] Only {len(results)} URLs extracted before the block")
     _logger.info(f"[{len(results)} URLs extracted]")
 
+
+def main():
+
+    # Setup configuration
+    args = _configure_argparse()
+    configure_logging(args.loglevel)
+
+    # Run the choosen action (engine search or reextract)
+    args.func(args)
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
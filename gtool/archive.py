@@ -0,0 +1,165 @@
+import gzip
+import json
+import base64
+from pathlib import Path
+from datetime import datetime
+from gtool.results import ResultSet
+from gtool.logs import setup_logging
+
+
+_logger = setup_logging(__name__)
+
+ARCHIVE_EXT = ".jsonl.gz"
+
+
+class ResponseArchive:
+    """ Append-only archive of the raw responses received by the engines (WARC-style).
+
+    Each response is stored as a JSON record compressed in its own gzip member, so
+    files can be appended by several processes and read as a single gzip stream.
+    A new file is created per engine and day the searches start (taken from the
+    search_id prefix, so a search is never split): <directory>/<engine>_<YYYYMMDD>.jsonl.gz
+
+    Parameters
+    ----------
+    directory: str
+        Folder where the archive files will be stored (created if it doesn't exist).
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def write(self, engine, search_id, page, attempt, params, response):
+        # Don't store the profile cookies (nor the new ones set by the engine)
+        request_headers = {k: v for k, v in response.request.headers.items() if k.lower() != "cookie"}
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "set-cookie"}
+        record = {
+            "engine": engine,
+            "search_id": search_id,
+            "page": page,
+            "attempt": attempt,
+            "date": datetime.now().isoformat(),
+            "params": params,
+            "request_url": response.request.url,
+            "request_headers": request_headers,
+            "status": response.status_code,
+            "url": response.url,
+            "history": [r.url for r in response.history],
+            "headers": headers,
+            **_encode_body(response),
+        }
+        member = gzip.compress(json.dumps(record).encode() + b"\n")
+
+        # A single write per record keeps the members whole when appending
+        path = self.directory / f"{engine}_{search_id[:8]}{ARCHIVE_EXT}"
+        with open(path, "ab") as file:
+            file.write(member)
+
+
+def _encode_body(response):
+    """ Store text bodies as text (base64 hides the repetitions from gzip and
+    makes the archive ~50% bigger). Only bodies that are not text go in base64.
+    """
+    encoding = response.encoding or "utf-8"
+    try:
+        text = response.content.decode(encoding)
+        if text.encode(encoding) == response.content:
+            return {"text": text, "encoding": encoding}
+    except (UnicodeError, LookupError):
+        pass
+    return {"content": base64.b64encode(response.content).decode("ascii")}
+
+
+class ArchivedResponse:
+    """ Minimal requests.Response replacement built from an archive record
+    (enough for the _detect_config_error, _detect_block and _extract_data methods of the engines).
+    """
+
+    def __init__(self, record):
+        self.status_code = record["status"]
+        self.url = record["url"]
+        self.history = [ArchivedRedirect(url) for url in record.get("history", [])]
+        self.headers = record.get("headers", {})
+        if "text" in record:
+            self.content = record["text"].encode(record["encoding"])
+        else:
+            self.content = base64.b64decode(record["content"])
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ArchivedRedirect:
+    def __init__(self, url):
+        self.url = url
+
+
+def archive_paths(paths):
+    """ Expand the folders of a list of paths into its archive files"""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files += sorted(path.glob(f"*{ARCHIVE_EXT}"))
+        elif path.is_file():
+            files.append(path)
+        else:
+            _logger.warning(f"[{path}] Archive not found. Skipping...")
+    return files
+
+
+def read_archive(path):
+    """ Iterate over the records of an archive file. A truncated tail (a crawler
+    killed mid-write or a file still being appended) ends the iteration.
+    """
+    try:
+        with gzip.open(path, "rt") as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+    except (EOFError, gzip.BadGzipFile) as e:
+        _logger.warning(f"[{path}] Truncated or corrupted archive ({e}). Keeping the records already read")
+
+
+def reextract_file(path, engines):
+    """ Run the _extract_data method of the engines over every archived response
+    of a file, without network.
+
+    Parameters
+    ----------
+    path: str
+        Archive file.
+
+    engines: dict
+        Engine classes by name ({cls.name: cls}).
+
+    Returns
+    -------
+    searches: list
+        One dict per search: {"search_id", "engine", "query", "date", "results" (ResultSet)}
+    """
+    searches = {}
+    for record in read_archive(path):
+        cls = engines.get(record["engine"])
+        if cls is None:
+            _logger.warning(f"[{path}] Unknown engine {record['engine']}. Skipping...")
+            continue
+
+        search = searches.setdefault(record["search_id"], {
+            "search_id": record["search_id"],
+            "engine": record["engine"],
+            "query": record["params"].get("q"),
+            "date": record["date"],
+            "results": ResultSet(),
+        })
+        response = ArchivedResponse(record)
+        if response.status_code != 200 or cls._detect_config_error(response) or cls._detect_block(response):
+            continue
+        cls._extract_data(response, search["results"], record["page"])
+
+    _logger.info(f"[{path}] {len(searches)} searches re-extracted")
+    return list(searches.values())
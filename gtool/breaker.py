@@ -0,0 +1,159 @@
+import os
+import json
+import fcntl
+from time import time
+from pathlib import Path
+from contextlib import contextmanager
+from gtool.settings import BREAKER_THRESHOLD, BREAKER_COOLDOWN, BREAKER_STATE_FILE
+from gtool.logs import setup_logging
+
+
+_logger = setup_logging(__name__)
+
+
+class CircuitOpenError(Exception):
+    """ Raised when a search is requested with an identity whose circuit is open."""
+    pass
+
+
+class CircuitBreaker:
+    """ Keep track of the blocks received by each identity (proxy, cookies...) to stop
+    sending requests from a burned one.
+
+        - closed: requests are allowed.
+        - open: the identity has been blocked `threshold` times in a row, requests
+          are rejected until `cooldown` seconds have passed.
+        - half-open: the cooldown is over and only the first caller of allow() gets
+          a probe request. A new block opens the circuit again, a success closes it.
+          If the probe never reports back, a new one is allowed after another cooldown.
+
+    The state is stored in `path` (wall-clock timestamps) so every run of the tool
+    shares it: an identity blocked in a run is skipped by the next ones. Updates are
+    serialized with an exclusive lock on a sidecar file (<path>.lock). If the file
+    can't be used, the state falls back to memory.
+
+    Parameters
+    ----------
+    threshold: int, optional
+        Consecutive blocks before the circuit is opened.
+
+    cooldown: float, optional
+        Seconds before an open circuit becomes half-open.
+
+    path: str, optional
+        JSON file with the state. None keeps the state in memory.
+    """
+
+    def __init__(self, threshold = BREAKER_THRESHOLD, cooldown = BREAKER_COOLDOWN, path = BREAKER_STATE_FILE):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.path = Path(path) if path else None
+        self._memory = {}
+
+    def _load(self):
+        """ identity -> {"blocks": consecutive blocks, "opened": timestamp, "probe": timestamp}"""
+        if not self.path:
+            return self._memory
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            _logger.warning(f"[CIRCUIT] Unreadable state file {self.path} ({e}). Starting from scratch")
+            return {}
+
+    def _save(self, circuits):
+        if self.path:
+            # Write and rename so a concurrent run never reads a half written file
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            try:
+                with open(tmp, "w") as file:
+                    json.dump(circuits, file)
+                os.replace(tmp, self.path)
+                return
+            except OSError as e:
+                self._disable_file(e)
+        self._memory = circuits
+
+    def _disable_file(self, error):
+        _logger.warning(f"[CIRCUIT] State file {self.path} not writable ({error}). Keeping the state in memory")
+        self.path = None
+
+    @contextmanager
+    def _update(self):
+        """ Load-modify-save of the state holding the lock, so concurrent runs
+        don't lose each other's updates.
+        """
+        lock = None
+        if self.path:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                lock = open(self.path.with_name(f"{self.path.name}.lock"), "w")
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            except OSError as e:
+                if lock:
+                    lock.close()
+                    lock = None
+                self._disable_file(e)
+        try:
+            circuits = self._load()
+            yield circuits
+            self._save(circuits)
+        finally:
+            if lock:
+                lock.close() # Releases the lock
+
+    def _state(self, circuit):
+        opened = circuit.get("opened")
+        if opened is None:
+            return "closed"
+        return "open" if time() - opened < self.cooldown else "half-open"
+
+    def state(self, identity):
+        return self._state(self._load().get(identity, {}))
+
+    def is_open(self, identity):
+        """ True if allow() would reject the identity right now (it doesn't claim the probe)"""
+        circuit = self._load().get(identity, {})
+        state = self._state(circuit)
+        if state == "half-open":
+            return time() - circuit.get("probe", 0) < self.cooldown
+        return state == "open"
+
+    def allow(self, identity):
+        """ Check if a request can be sent with the identity. In half-open state, the
+        first caller claims the probe and the next ones are rejected.
+        """
+        if self.state(identity) == "closed":
+            return True
+        with self._update() as circuits:
+            circuit = circuits.get(identity, {})
+            state = self._state(circuit)
+            if state == "closed":
+                return True
+            if state == "open" or time() - circuit.get("probe", 0) < self.cooldown:
+                return False
+            circuit["probe"] = time()
+            circuits[identity] = circuit
+        _logger.info(f"[CIRCUIT HALF-OPEN] {identity} probe request allowed")
+        return True
+
+    def record_block(self, identity):
+        with self._update() as circuits:
+            circuit = circuits.setdefault(identity, {})
+            circuit["blocks"] = circuit.get("blocks", 0) + 1
+            # A block during half-open reopens the circuit straight away
+            if circuit["blocks"] >= self.threshold or "opened" in circuit:
+                circuit["opened"] = time()
+                circuit.pop("probe", None)
+                _logger.warning(f"[CIRCUIT OPEN] {identity} blocked {circuit['blocks']} times. Cooldown: {self.cooldown}s")
+
+    def record_success(self, identity):
+        # Most pages find a closed circuit, no need to take the lock
+        if identity not in self._load():
+            return
+        with self._update() as circuits:
+            circuit = circuits.pop(identity, None)
+        if circuit and "opened" in circuit:
+            _logger.info(f"[CIRCUIT CLOSED] {identity}")
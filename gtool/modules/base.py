@@ -2,15 +2,29 @@ import random
 import requests
 import argparse
 import logging
-from time import sleep
+import hashlib
+import uuid
+from time import sleep, monotonic
+from collections import Counter
 from datetime import datetime
 from abc import ABC, abstractmethod
+from gtool.breaker import CircuitBreaker, CircuitOpenError
+from gtool.retry import RetryPolicy
+from gtool.archive import ResponseArchive
+from gtool.results import ResultSet
 
 
 # Set logger for this file
 _logger = logging.getLogger(__name__)
 
 class BaseEngine(ABC):
+    BLOCK_STATUS_CODES = (429,)
+    BLOCK_URLS = () # Substrings of the final url (or any redirect) that mean a block
+    BLOCK_MARKERS = () # Byte strings of the raw content that mean a block
+    CONFIG_ERROR_URLS = {} # Substrings of the final url (or any redirect) -> configuration problem
+
+    # Shared by all the instances (and runs) so a burned identity is skipped by every search
+    circuit_breaker = CircuitBreaker()
 
     def __init__(self, *, 
             search_url,
@@ -18,6 +32,8 @@ class BaseEngine(ABC):
             lang = None,
             time = None,
             range = None,
+            retry_policy = None,
+            archive = None,
         ):
         self.lang = lang
         self.search_url = search_url
@@ -25,6 +41,12 @@ class BaseEngine(ABC):
         self.time = time
         self.range = range
         self.PAGE_JUMP = 10 # Number param to jump to the next page
+        self.block_reason = None # Set when the last search ended due to a block
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.stats = Counter() # Requests, retries, blocks... of the last search
+        self.archive = archive # ResponseArchive where the raw responses are stored
+        self.search_id = None
+        self.deadline = None # monotonic() time limit of the current search
 
 
     @classmethod
@@ -90,7 +112,13 @@ class BaseEngine(ABC):
         return cls(
             **kwargs, # Contain args from the child is going to be instanced
             time=args.time, 
-            range=args.range
+            range=args.range,
+            retry_policy=RetryPolicy(
+                max_attempts=args.retries,
+                read_timeout=args.timeout,
+                deadline=args.deadline,
+            ),
+            archive=ResponseArchive(args.archive) if args.archive else None
         )
     
     @classmethod
@@ -145,36 +173,153 @@ class BaseEngine(ABC):
     def _initialize_search(self, session, query, **kwargs):
         """ This method will be created in each Search Engine to initialize any 
         additional information about the session. It will also set up and 
-        return its own parameters dictionary.
+        return its own parameters dictionary (or None to stop the search).
         """
         pass
 
+    @classmethod
     @abstractmethod
-    def _extract_data(self, response, count, page):
+    def _extract_data(cls, response, results, page):
+        """ Parse a 200 status_code response appending every URL found to the
+        results (ResultSet). It must not use the instance so it can also be run
+        over archived responses (see gtool.archive).
+        """
         pass
 
+    @classmethod
+    def _detect_block(cls, response):
+        """ Cheap check over the status code, the final url (and redirects) and the
+        raw content of the response, before any parsing.
+
+        Returns
+        -------
+        reason: str
+            The reason of the block or None if the response looks fine.
+        """
+        if response.status_code in cls.BLOCK_STATUS_CODES:
+            return f"status {response.status_code}"
+        for r in (*response.history, response):
+            for block_url in cls.BLOCK_URLS:
+                if block_url in r.url:
+                    return f"redirected to {r.url}"
+        content = response.content
+        for marker in cls.BLOCK_MARKERS:
+            if marker in content:
+                return f"content marker {marker!r}"
+        return None
+
+    @classmethod
+    def _detect_config_error(cls, response):
+        """ Like _detect_block but for answers caused by the configuration of the
+        profile (expired cookies...). They don't count as blocks.
+
+        Returns
+        -------
+        reason: str
+            What has to be fixed or None if the response looks fine.
+        """
+        for r in (*response.history, response):
+            for config_url, reason in cls.CONFIG_ERROR_URLS.items():
+                if config_url in r.url:
+                    return reason
+        return None
+
+    def _identity(self, session):
+        """ Key used by the circuit breaker. Hashed so proxy credentials are never logged."""
+        proxy = (session.proxies or {}).get("https", "direct")
+        return hashlib.sha1(proxy.encode()).hexdigest()[:10]
+
+    def _fetch(self, session, params, page = None, url = None):
+        """ Request a page (or any other `url` needed by the engine) retrying the
+        transient failures of the retry policy until the search deadline. Every
+        response of the result pages (retried ones included) is archived.
+
+        Returns
+        -------
+        response: requests.Response
+            The last response received or None if every attempt failed or the
+            deadline has been reached.
+        """
+        policy = self.retry_policy
+        deadline = self.deadline
+        for attempt in range(1, policy.max_attempts + 1):
+            timeout = policy.timeout
+            if deadline:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    _logger.error("[DEADLINE] Search deadline reached. Skipping...")
+                    return None
+                timeout = (min(policy.connect_timeout, remaining), min(policy.read_timeout, remaining))
+
+            self.stats["requests"] += 1
+            try:
+                response = session.get(url or self.search_url, params=params, timeout=timeout)
+                if self.archive and page is not None:
+                    self.archive.write(self.name, self.search_id, page, attempt, params, response)
+                # Blocks (f.e. /sorry/ with a 503) are never transient, the caller handles them
+                if response.status_code not in policy.statuses or \
+                        self._detect_config_error(response) or self._detect_block(response):
+                    return response
+                error = f"status {response.status_code}"
+            except policy.exceptions as e:
+                response = None
+                error = f"{type(e).__name__}: {str(e)}"
+
+            # Out of attempts/time: error responses are reported by the caller
+            delay = policy.backoff(attempt)
+            if attempt == policy.max_attempts or (deadline and monotonic() + delay >= deadline):
+                if response is None:
+                    _logger.error(f"An error has ocurred during the search [{error}]. Skipping...")
+                return response
+            self.stats["retries"] += 1
+            _logger.warning(f"[RETRY {attempt}/{policy.max_attempts - 1}] {error}. Sleeping {delay:.3f}s")
+            sleep(delay)
+
+    def _check_response(self, session, response):
+        """ Report the errors, configuration problems and blocks (captcha, unusual
+        traffic...) of a _fetch response before parsing anything.
+
+        Returns
+        -------
+        ok: bool
+            True if the response is a 200 that can be parsed.
+        """
+        if response is None:
+            self.stats["errors"] += 1
+            return False
+        reason = self._detect_config_error(response)
+        if reason:
+            _logger.error(f"[CONFIG ERROR] {reason}. Skipping...")
+            self.stats["config_errors"] += 1
+            return False
+        reason = self._detect_block(response)
+        if reason:
+            _logger.error(f"[BLOCKED] {reason}. Try to go to the browser and answer the captcha if it is necessary.")
+            self.circuit_breaker.record_block(self._identity(session))
+            self.block_reason = reason
+            self.stats["blocks"] += 1
+            return False
+        if response.status_code != 200:
+            _logger.error(f"An error has ocurred during the search [{response.status_code}].  Skipping...")
+            self.stats["errors"] += 1
+            return False
+        self.circuit_breaker.record_success(self._identity(session))
+        return True
+
     def _search(self, session, params, max_pages, bot_sleep_interval):
-        results = []
+        results = ResultSet()
         for i in range(0, max_pages):
             
             # Add pagination
             params["start"] = i*self.PAGE_JUMP if i else None
 
-            try:
-                response = session.get(self.search_url, params=params)
-                if response.status_code != 200:
-                    if response.status_code == 429:
-                        _logger.error("Captcha block. Try to go to the browser and answer the captcha if it is necessary.")
-                    else:
-                        _logger.error(f"An error has ocurred during the search [{response.status_code}].  Skipping...")
-                    break
-            except requests.exceptions.ProxyError as e:
-                _logger.error(f"Proxy error {str(e)}")
+            response = self._fetch(session, params, page=i)
+            if not self._check_response(session, response):
                 break
 
             # Extract results
             count = len(results)
-            results += self._extract_data(response, count, i)
+            self._extract_data(response, results, i)
             if count == len(results):
                 _logger.warning("[NO RESULTS FOUND] Skipping...")
                 return results
@@ -223,8 +368,19 @@ class BaseEngine(ABC):
         kwargs: dict, optional
             Extra keywords arguments to use in the _initialize_search method
             to allow different engines to use extra data without repeating code.
+
+        Returns
+        -------
+        results: ResultSet
+            Compact container with the URLs found. Iterating over it yields
+            {"url", "position", "page"} dicts.
         """
         _logger.info(f"[USER AGENT]: {user_agent}")
+        self.block_reason = None
+        self.stats = Counter()
+        # Prefixed with the start date, the archive names its files after it
+        self.search_id = f"{datetime.now():%Y%m%d%H%M%S}_{uuid.uuid4().hex}"
+        self.deadline = monotonic() + self.retry_policy.deadline if self.retry_policy.deadline else None
         with requests.Session() as s:
 
             # Add proxyinfo
@@ -233,10 +389,16 @@ class BaseEngine(ABC):
             # Add headers
             s.headers.update(dict(self.headers, **{'user-agent': user_agent}))
 
-            # Initialize search (params, headers, etc..)
+            # Skip burned identities until their cooldown is over
+            identity = self._identity(s)
+            if not self.circuit_breaker.allow(identity):
+                raise CircuitOpenError(f"Identity {identity} is blocked. Wait for the cooldown or use another proxy/profile.")
+
+            # Initialize search (params, headers, etc..). None means it has failed (already logged)
             params = self._initialize_search(s, query, **kwargs)
 
             # Init search
-            results = self._search(s, params, max_pages, bot_sleep_interval)
+            results = self._search(s, params, max_pages, bot_sleep_interval) if params is not None else ResultSet()
 
+        _logger.info(f"[STATS]: {dict(self.stats)}")
         return results
\ No newline at end of file
@@ -78,12 +78,14 @@ class DuckDuckGoEngine(BaseEngine):
     def _initialize_search(self, session, query):
         
         # Simple requests to extract vqd (unique identifier associated with the search) generated by DDG
-        response = session.get(
-            'https://duckduckgo.com/', 
-            params={'q': query}, 
-            headers=self.headers
-        )
+        response = self._fetch(session, {'q': query}, url='https://duckduckgo.com/')
+        if not self._check_response(session, response):
+            return None
         vqd_obj = re.search(r'vqd=([\d-]+)\&', response.text, re.M | re.I)
+        if not vqd_obj:
+            _logger.error("[NO VQD] DuckDuckGo didn't return the search identifier (vqd). Skipping...")
+            self.stats["errors"] += 1
+            return None
 
         # Conf date filters
         df = ''
@@ -105,15 +107,11 @@ class DuckDuckGoEngine(BaseEngine):
             'df': df,
         }
 
-    def _extract_data(self, response, count, page):
+    @classmethod
+    def _extract_data(cls, response, results, page):
         """ Receive a 200 status_code response from the search engine
         """
-        return [
-            {
-                "url": item["url"].strip().lower(), 
-                "position": index+1+count,
-                "page": page+1
-            }
-            for index, item in enumerate(response.json().get("results", []))
-            if "url" in item
-        ]
+        count = len(results)
+        for index, item in enumerate(response.json().get("results", [])):
+            if "url" in item:
+                results.append(item["url"].strip().lower(), index+1+count, page+1)
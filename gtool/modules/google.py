@@ -1,11 +1,13 @@
 import os
 import random
+import hashlib
 from pathlib import Path
-from dotenv import load_dotenv
+from dotenv import load_dotenv, dotenv_values
 from lxml import html
 from time import sleep
-from gtool.settings import GOOGLE_SEARCH, NEWS_CARD_XPATH
+from gtool.settings import GOOGLE_SEARCH, NEWS_CARD_XPATH, GOOGLE_BLOCK_URLS, GOOGLE_BLOCK_MARKERS, GOOGLE_CONFIG_ERROR_URLS
 from gtool.modules.base import BaseEngine
+from gtool.breaker import CircuitOpenError
 from gtool.logs import setup_logging
 
 
@@ -14,8 +16,11 @@ _logger = setup_logging(__name__)
 class GoogleEngine(BaseEngine):
     name = "Google"
     help = "Use the Google search engine to scrape news. COOKIE_AEC and COOKIE_SOCS env vars required"
+    BLOCK_URLS = tuple(GOOGLE_BLOCK_URLS)
+    BLOCK_MARKERS = tuple(GOOGLE_BLOCK_MARKERS)
+    CONFIG_ERROR_URLS = dict(GOOGLE_CONFIG_ERROR_URLS)
 
-    def __init__(self, sort = False, rotate = False, **kwargs):
+    def __init__(self, sort = False, rotate = False, use_proxy = False, **kwargs):
         """ * -> force all arguments afterwards are keyword-only
         """
         headers = {
@@ -30,6 +35,7 @@ class GoogleEngine(BaseEngine):
         )
         self.sort = sort
         self.rotate = rotate
+        self.use_proxy = use_proxy # PROXY_URL will be used (only to choose the profile with --rotate)
 
         # Check Google engine required enviroment variables (AOC/SOCS cookies)
         if rotate:
@@ -106,7 +112,8 @@ class GoogleEngine(BaseEngine):
             args, 
             lang=args.lang,
             sort=args.sort,
-            rotate=args.rotate
+            rotate=args.rotate,
+            use_proxy=args.proxies
         )
     
     def _rotate_profile(self):
@@ -118,6 +125,13 @@ class GoogleEngine(BaseEngine):
             if not envs:
                 _logger.error(" -r/--random argument selected but ./profile don't contains any .env file.")
                 return False
+
+            # Discard the profiles blocked in previous runs (open circuit)
+            available = [env for env in envs if not self.circuit_breaker.is_open(self._profile_identity(env))]
+            if not available:
+                raise CircuitOpenError("-r/--random argument selected but every profile in ./profiles is blocked. Wait for the cooldown.")
+            _logger.info(f"[{len(envs) - len(available)} blocked profiles skipped]")
+            envs = available
             
             env_select = random.choice(envs)
             load_dotenv(env_select)
@@ -127,6 +141,24 @@ class GoogleEngine(BaseEngine):
         _logger.error(" -r/--random argument selected but ./profile folder not found.")
         return False
 
+    @classmethod
+    def _identity_key(cls, proxy, aec):
+        """ Google blocks are tied to the proxy and to the cookies of the profile"""
+        return hashlib.sha1(f"{proxy}|{aec}".encode()).hexdigest()[:10]
+
+    def _profile_identity(self, env):
+        """ Identity that a search would have after loading the `env` file (load_dotenv
+        doesn't override the environment). The proxy only counts if it will be used.
+        """
+        values = dotenv_values(env)
+        aec = os.getenv('COOKIE_AEC') or values.get('COOKIE_AEC')
+        proxy = (os.getenv('PROXY_URL') or values.get('PROXY_URL')) if self.use_proxy else None
+        return self._identity_key(proxy or 'direct', aec)
+
+    def _identity(self, session):
+        proxy = (session.proxies or {}).get("https", "direct")
+        return self._identity_key(proxy, os.getenv('COOKIE_AEC'))
+
     def _initialize_search(self, session, query):
         """
         Google cookies:
@@ -163,17 +195,13 @@ class GoogleEngine(BaseEngine):
             'lr': self.lang
         }
 
-    def _extract_data(self, response, count, page):
+    @classmethod
+    def _extract_data(cls, response, results, page):
         """ Receive a 200 status_code response from the search engine
         """
         # Parse html content
         tree = html.fromstring(response.content)
-        return [
-            {
-                "url": card_urls[0].get("href").strip().lower(), 
-                "position": index+1+count,
-                "page": page+1
-            }
-            for index, card in enumerate(tree.xpath(NEWS_CARD_XPATH))
-            if (card_urls := card.xpath(".//a"))
-        ]   
+        count = len(results)
+        for index, card in enumerate(tree.xpath(NEWS_CARD_XPATH)):
+            if (card_urls := card.xpath(".//a")):
+                results.append(card_urls[0].get("href").strip().lower(), index+1+count, page+1)   
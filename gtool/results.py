@@ -0,0 +1,52 @@
+import sys
+import json
+from array import array
+
+
+class ResultSet:
+    """ Compact container of search results stored by columns: a list of interned
+    URLs and two unsigned int arrays for the position and the page. Appending never
+    copies the previous results and there is no dict per result.
+
+    Iterating yields the classic {"url", "position", "page"} dicts.
+    """
+    __slots__ = ("urls", "positions", "pages")
+
+    def __init__(self):
+        self.urls = []
+        self.positions = array("I")
+        self.pages = array("H")
+
+    def append(self, url, position, page):
+        self.urls.append(sys.intern(url))
+        self.positions.append(position)
+        self.pages.append(page)
+
+    def __len__(self):
+        return len(self.urls)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return {
+            "url": self.urls[index],
+            "position": self.positions[index],
+            "page": self.pages[index]
+        }
+
+    def __iter__(self):
+        for url, position, page in zip(self.urls, self.positions, self.pages):
+            yield {"url": url, "position": position, "page": page}
+
+    def to_list(self):
+        return list(self)
+
+    def write_json(self, file):
+        """ Same output as json.dump(results.to_list(), file) without building the list"""
+        file.write("[")
+        for index, result in enumerate(self):
+            file.write((", " if index else "") + json.dumps(result))
+        file.write("]")
+
+    def write_txt(self, file):
+        file.writelines(f"{url}\n" for url in self.urls)
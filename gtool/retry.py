@@ -0,0 +1,60 @@
+import random
+from requests.exceptions import ConnectionError, Timeout
+from gtool.settings import (
+    RETRY_STATUS_CODES, RETRY_MAX_ATTEMPTS, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX,
+    CONNECT_TIMEOUT, READ_TIMEOUT, SEARCH_DEADLINE
+)
+
+
+class RetryPolicy:
+    """ Which failures are retried by an engine and how long it waits between attempts.
+
+    Parameters
+    ----------
+    statuses: iterable, optional
+        Status codes considered transient (5xx by default).
+
+    exceptions: tuple, optional
+        Exceptions considered transient (connection/proxy errors and timeouts by default).
+
+    max_attempts: int, optional
+        Attempts per page, including the first one (1 means no retries).
+
+    backoff_base, backoff_max: float, optional
+        The sleep before the attempt N is a random value between 0 and
+        min(backoff_max, backoff_base * 2**N) seconds (full jitter).
+
+    connect_timeout, read_timeout: float, optional
+        Timeouts (in seconds) for every request.
+
+    deadline: float, optional
+        Total seconds allowed per search. None means no limit.
+    """
+
+    def __init__(self,
+            statuses = RETRY_STATUS_CODES,
+            exceptions = (ConnectionError, Timeout), # ProxyError is a ConnectionError
+            max_attempts = RETRY_MAX_ATTEMPTS,
+            backoff_base = RETRY_BACKOFF_BASE,
+            backoff_max = RETRY_BACKOFF_MAX,
+            connect_timeout = CONNECT_TIMEOUT,
+            read_timeout = READ_TIMEOUT,
+            deadline = SEARCH_DEADLINE,
+        ):
+        self.statuses = frozenset(statuses)
+        self.exceptions = tuple(exceptions)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+
+    @property
+    def timeout(self):
+        """ Timeout tuple in the requests library format (connect, read)"""
+        return (self.connect_timeout, self.read_timeout)
+
+    def backoff(self, attempt):
+        """ Jittered exponential sleep (in seconds) before retrying after `attempt` failed attempts"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
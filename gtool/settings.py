@@ -1,6 +1,7 @@
 #===============================
 #==== Gtool global settings ====
 #===============================
+from pathlib import Path
 
 
 GOOGLE_SEARCH = "https://www.google.com/search"
@@ -14,4 +15,34 @@ USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36 Edg/113.0.1774.42", # A
 ]
 
-NEWS_CARD_XPATH = "//div[@id='search']/div/div/div/div/div"
\ No newline at end of file
+NEWS_CARD_XPATH = "//div[@id='search']/div/div/div/div/div"
+
+# Soft-block detection. Google usually answers a burned identity with a 200 "unusual traffic"
+# page or a redirect to /sorry/ instead of a 429
+GOOGLE_BLOCK_URLS = [
+    "/sorry/",
+]
+GOOGLE_BLOCK_MARKERS = [
+    b"Our systems have detected unusual traffic",
+    b'id="captcha-form"',
+    b'class="g-recaptcha"',
+]
+
+# A redirect to the consent page is not a block: the SOCS cookie of the profile is missing or expired
+GOOGLE_CONFIG_ERROR_URLS = {
+    "consent.google.com": "consent page: refresh COOKIE_SOCS",
+}
+
+# Circuit breaker (per identity/proxy). The state is shared by every run through a file
+BREAKER_THRESHOLD = 3 # Consecutive blocks before the identity is discarded
+BREAKER_COOLDOWN = 900 # Seconds before a discarded identity is tried again (half-open)
+BREAKER_STATE_FILE = Path.home() / ".gtool" / "breaker.json"
+
+# Retry policy for transient failures (5xx, proxy errors, timeouts)
+RETRY_STATUS_CODES = [500, 502, 503, 504]
+RETRY_MAX_ATTEMPTS = 3 # Attempts per page (1 = no retries)
+RETRY_BACKOFF_BASE = 1.0 # Seconds, doubled on each attempt
+RETRY_BACKOFF_MAX = 30.0 # Upper bound of a single backoff sleep
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 20.0
+SEARCH_DEADLINE = 300.0 # Total seconds allowed per search (None = no limit)